@@ -1,23 +1,57 @@
 import ollama
 import os
+import sys
+import io
+import asyncio
 import time
+import random
+import atexit
+import functools
+import contextlib
+import threading
 import subprocess
+import shutil
 import requests
 import difflib
 import json
+import re
+import math
+import mmap
+import stat
+import sqlite3
+import hashlib
+import datetime
 import importlib.util
-from typing import Dict, Any, Optional, List
+from array import array
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator, Iterable, Iterator
 from colorama import Fore, Style, init
 from enum import Enum
 import google.generativeai as genai
+from google.generativeai import caching
 import openai
+import httpx
 from dotenv import load_dotenv
 from tinydb import TinyDB, Query
+from tinydb.storages import Storage
+from tinydb.middlewares import CachingMiddleware
+import orjson
 
 # Initialize environment and colorama
 load_dotenv()
 init(autoreset=True)
 
+# Color prefixes; autoreset ends each write, and pipes/CI get no ANSI codes at all
+USE_COLOR = sys.stdout.isatty()
+CYAN, GREEN, YELLOW, RED, MAGENTA, WHITE = (
+    (Fore.CYAN, Fore.GREEN, Fore.YELLOW, Fore.RED, Fore.MAGENTA, Fore.WHITE) if USE_COLOR else ("",) * 6
+)
+# Still needed inside multi-line writes and input() prompts, which autoreset does not cover
+RST = Style.RESET_ALL if USE_COLOR else ""
+
+# Configure Gemini once at import when a key is available
+if os.getenv("GEMINI_API_KEY"):
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
 # Enum Definitions
 class LogLevel(Enum):
     INFO = "INFO"
@@ -32,54 +66,141 @@ class ModelProvider(Enum):
     GEMINI = "gemini"
 
 # Core Components
+LOG_QUERY = Query()
+
+def diff_lines(filename: str, old_code: str, new_code: str, context: int = 3) -> Iterator[str]:
+    """Lazily yield a GitHub-style unified diff for one file"""
+    return difflib.unified_diff(
+        old_code.splitlines(),
+        new_code.splitlines(),
+        fromfile=f'a/{filename}',
+        tofile=f'b/{filename}',
+        lineterm='',
+        n=context
+    )
+
+def resolve_command(command: List[str]) -> List[str]:
+    """Resolve the executable via PATH/PATHEXT so wrappers like npm.cmd start on Windows"""
+    executable = shutil.which(command[0])
+    return [executable, *command[1:]] if executable else command
+
+def write_diff(diff: Iterable[str]):
+    """Write colorized diff lines to stdout in a single buffered call"""
+    lines = [GREEN + line + RST if line[:1] == '+'
+             else RED + line + RST if line[:1] == '-'
+             else line
+             for line in diff]
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+
+class OrjsonStorage(Storage):
+    """TinyDB JSON file storage serialized with orjson"""
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return orjson.loads(data) if data else None
+
+    def write(self, data: Dict[str, Any]):
+        with open(self.path, 'wb') as f:
+            f.write(orjson.dumps(data))
+
+    def close(self):
+        pass
+
 class Logger:
     """Enhanced logging system with different levels and colors"""
     COLORS = {
-        LogLevel.INFO: Fore.CYAN,
-        LogLevel.SUCCESS: Fore.GREEN,
-        LogLevel.WARNING: Fore.YELLOW,
-        LogLevel.ERROR: Fore.RED,
-        LogLevel.DEBUG: Fore.MAGENTA
+        LogLevel.INFO: CYAN,
+        LogLevel.SUCCESS: GREEN,
+        LogLevel.WARNING: YELLOW,
+        LogLevel.ERROR: RED,
+        LogLevel.DEBUG: MAGENTA
     }
 
+    _db: Optional[TinyDB] = None
+    _last_second: int = -1
+    _last_timestamp: str = ""
+    # Console lines held back while an interactive review owns the terminal
+    _console_lock = threading.Lock()
+    _held_lines: Optional[List[str]] = None
+
     def __init__(self, agent_name: str):
         self.agent_name = agent_name
-        self.db = TinyDB('logs.json')
+        self.db = self._get_db()
+
+    @classmethod
+    def _get_db(cls) -> TinyDB:
+        """Open the shared log database, buffering writes in memory"""
+        if cls._db is None:
+            cls._db = TinyDB('logs.json', storage=CachingMiddleware(OrjsonStorage))
+            atexit.register(cls.flush)
+        return cls._db
+
+    @classmethod
+    def flush(cls):
+        """Write buffered log entries to logs.json"""
+        if cls._db is not None:
+            cls._db.storage.flush()
+
+    @classmethod
+    @contextlib.contextmanager
+    def hold_console(cls) -> Iterator[None]:
+        """Buffer console log output until the block exits, then print it in order"""
+        with cls._console_lock:
+            cls._held_lines = []
+        try:
+            yield
+        finally:
+            with cls._console_lock:
+                held, cls._held_lines = cls._held_lines, None
+                if held:
+                    print('\n'.join(held))
+
+    @classmethod
+    def _echo(cls, line: str):
+        """Print a log line, or hold it while the console is reserved"""
+        with cls._console_lock:
+            if cls._held_lines is not None:
+                cls._held_lines.append(line + RST)
+            else:
+                print(line)
+
+    @classmethod
+    def _timestamp(cls) -> str:
+        """Return the current time formatted, reformatting at most once per second"""
+        now = int(time.time())
+        if now != cls._last_second:
+            cls._last_second = now
+            cls._last_timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        return cls._last_timestamp
 
     def log(self, message: str, level: LogLevel = LogLevel.INFO):
         """Log formatted messages with timestamp and level"""
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        color = self.COLORS.get(level, Fore.WHITE)
+        timestamp = self._timestamp()
+        color = self.COLORS.get(level, WHITE)
         log_entry = f"[{timestamp}] [{level.value}] {self.agent_name}: {message}"
-        print(f"{color}{log_entry}{Style.RESET_ALL}")
+        self._echo(color + log_entry)
         
         # Check for duplicate entries before inserting
-        existing_entry = self.db.search(Query().message == message)
+        existing_entry = self.db.search(LOG_QUERY.message == message)
         if not existing_entry:
             self.db.insert({'timestamp': timestamp, 'level': level.value, 'message': message})
 
     def log_code_change(self, old_code: str, new_code: str, filename: str):
         """Log code changes in GitHub-style diff format"""
-        diff = difflib.unified_diff(
-            old_code.splitlines(),
-            new_code.splitlines(),
-            fromfile=f'a/{filename}',
-            tofile=f'b/{filename}',
-            lineterm=''
-        )
         self.log(f"Code changes for {filename}:", LogLevel.INFO)
-        for line in diff:
-            if line.startswith('+'):
-                print(f"{Fore.GREEN}{line}{Style.RESET_ALL}")
-            elif line.startswith('-'):
-                print(f"{Fore.RED}{line}{Style.RESET_ALL}")
-            else:
-                print(line)
+        write_diff(diff_lines(filename, old_code, new_code))
 
 class DatabaseManager:
     """Handles database configuration and migrations using NeDB"""
     def __init__(self):
-        self.logger = Logger("DBManager")
+        self.logger = get_logger("DBManager")
         self.config_path = 'db_config.json'
         self.migrations_dir = 'migrations'
         self._initialize_db()
@@ -88,7 +209,7 @@ class DatabaseManager:
         """Initialize database configuration"""
         if not os.path.exists(self.config_path):
             self._create_initial_config()
-        self.db = TinyDB(self.config_path)
+        self.db = TinyDB(self.config_path, storage=CachingMiddleware(OrjsonStorage))
         os.makedirs(self.migrations_dir, exist_ok=True)
 
     def _create_initial_config(self):
@@ -105,13 +226,21 @@ class DatabaseManager:
     def apply_migrations(self):
         """Apply pending database migrations"""
         config = self.db.all()[0]
-        applied = config['migrations']
-        migration_files = sorted(os.listdir(self.migrations_dir))
+        applied = list(config['migrations'])
+        applied_set = set(applied)
+        with os.scandir(self.migrations_dir) as entries:
+            migration_files = sorted(e.name for e in entries if e.is_file() and e.name.endswith('.py'))
+        pending = [m for m in migration_files if m not in applied_set]
         
-        for migration in migration_files:
-            if migration not in applied:
+        # Record everything that ran in one write, even if a later migration fails
+        try:
+            for migration in pending:
                 self._run_migration(migration)
-                self.db.update({'migrations': applied + [migration]})
+                applied.append(migration)
+        finally:
+            if len(applied) != len(config['migrations']):
+                self.db.update({'migrations': applied})
+            self.db.storage.flush()
 
     def _run_migration(self, filename: str):
         """Execute a migration file"""
@@ -130,28 +259,37 @@ class ConsoleUI:
     """Interactive console user interface with menu system"""
     def show_menu(self, title: str, options: List[str]) -> List[int]:
         """Display a numbered menu and return selected indices"""
-        print(f"\n{Fore.CYAN}=== {title} ==={Style.RESET_ALL}")
-        for i, option in enumerate(options, 1):
-            print(f"{Fore.YELLOW}{i}. {option}{Style.RESET_ALL}")
-        selections = input(f"\n{Fore.GREEN}Enter selections (comma-separated): {Style.RESET_ALL}")
+        print(f"\n{CYAN}=== {title} ===")
+        print('\n'.join(f"{YELLOW}{i}. {option}{RST}" for i, option in enumerate(options, 1)))
+        selections = input(f"\n{GREEN}Enter selections (comma-separated): {RST}")
         return [int(s.strip()) - 1 for s in selections.split(',')]
 
     def show_diff(self, diff: List[str]):
         """Display diff output with colors"""
-        print(f"\n{Fore.CYAN}=== Code Changes ==={Style.RESET_ALL}")
-        for line in diff:
-            if line.startswith('+'):
-                print(Fore.GREEN + line + Style.RESET_ALL)
-            elif line.startswith('-'):
-                print(Fore.RED + line + Style.RESET_ALL)
-            else:
-                print(line)
+        print(f"\n{CYAN}=== Code Changes ===")
+        write_diff(diff)
 
     def confirm_action(self, question: str) -> bool:
         """Get user confirmation for critical actions"""
-        response = input(f"{Fore.YELLOW}{question} (y/n): {Style.RESET_ALL}")
+        response = input(f"{YELLOW}{question} (y/n): {RST}")
         return response.lower() == 'y'
 
+# Shared component factories
+@functools.cache
+def get_logger(agent_name: str) -> Logger:
+    """Return the shared Logger for an agent name"""
+    return Logger(agent_name)
+
+@functools.cache
+def get_db_manager() -> DatabaseManager:
+    """Return the process-wide DatabaseManager"""
+    return DatabaseManager()
+
+@functools.cache
+def get_console_ui() -> ConsoleUI:
+    """Return the process-wide ConsoleUI"""
+    return ConsoleUI()
+
 # AI Model Components
 class ModelConfig:
     """Configuration class for AI models"""
@@ -162,67 +300,472 @@ class ModelConfig:
         self.api_key = api_key or os.getenv(f"{provider.name}_API_KEY")
         self.base_url = base_url
 
+class RateLimiter:
+    """Async token-bucket limiter allowing `rate` requests per `period` seconds"""
+    def __init__(self, rate: int, period: float = 60.0):
+        self.capacity = rate
+        self.fill_rate = rate / period
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    async def __aenter__(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return self
+            await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+class SemanticCache:
+    """Prompt/response cache stored in SQLite with optional embedding matching"""
+    def __init__(self, path: str = 'semantic_cache.db', threshold: float = 0.95):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS prompt_cache (
+            model TEXT NOT NULL,
+            system_key TEXT NOT NULL,
+            key TEXT NOT NULL,
+            embedding BLOB,
+            norm REAL,
+            content TEXT NOT NULL,
+            PRIMARY KEY (model, key))""")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """Hash prompt text for exact-match lookups"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, model: str, key: str) -> Optional[str]:
+        """Return the response cached for an identical prompt"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT content FROM prompt_cache WHERE model = ? AND key = ?", (model, key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def search(self, model: str, system_key: str, embedding: List[float]) -> Optional[str]:
+        """Return the most similar response cached under the same system prompt"""
+        query_norm = math.sqrt(sum(x * x for x in embedding))
+        if not query_norm:
+            return None
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT embedding, norm, content FROM prompt_cache "
+                "WHERE model = ? AND system_key = ? AND embedding IS NOT NULL",
+                (model, system_key)
+            ).fetchall()
+        best_score, best_content = self.threshold, None
+        for blob, norm, content in rows:
+            vector = array('f')
+            vector.frombytes(blob)
+            if len(vector) != len(embedding) or not norm:
+                continue
+            score = sum(a * b for a, b in zip(vector, embedding)) / (norm * query_norm)
+            if score >= best_score:
+                best_score, best_content = score, content
+        return best_content
+
+    def insert(self, model: str, system_key: str, key: str,
+               embedding: Optional[List[float]], content: str):
+        """Store a response, with the prompt embedding when one is available"""
+        blob, norm = None, None
+        if embedding:
+            vector = array('f', embedding)
+            blob, norm = vector.tobytes(), math.sqrt(sum(x * x for x in vector))
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (model, system_key, key, blob, norm, content)
+            )
+            self.conn.commit()
+
+    def delete(self, model: str, key: str):
+        """Evict a cached response, e.g. one the reviewer rejected"""
+        with self._lock:
+            self.conn.execute("DELETE FROM prompt_cache WHERE model = ? AND key = ?", (model, key))
+            self.conn.commit()
+
 class AIModel:
     """Wrapper class for different AI models"""
+    EMBEDDING_MODELS = {
+        ModelProvider.GEMINI: "models/text-embedding-004",
+        ModelProvider.OPENAI: "text-embedding-3-small",
+        ModelProvider.OLLAMA: "nomic-embed-text"
+    }
+    DEFAULT_QPM = {
+        ModelProvider.GEMINI: 500,
+        ModelProvider.OPENAI: 500,
+        ModelProvider.OLLAMA: 50
+    }
+    MAX_RETRIES = 5
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 30.0
+    PREFIX_CACHE_TTL = datetime.timedelta(minutes=30)
+    # Gemini rejects cached contents below this size; roughly four characters per token
+    PREFIX_CACHE_MIN_TOKENS = 4096
+    _prefix_unsupported: set = set()
+    _throttles: Dict[ModelProvider, Tuple[asyncio.Semaphore, RateLimiter]] = {}
+    _cache: Optional[SemanticCache] = None
+    _gemini_models: Dict[str, genai.GenerativeModel] = {}
+    _gemini_api_key: Optional[str] = os.getenv("GEMINI_API_KEY")
+
     def __init__(self, config: ModelConfig):
         self.config = config
-        self.logger = Logger("AIModel")
+        self.logger = get_logger("AIModel")
         self._initialize_provider()
+        self._sem, self._limiter = self._get_throttle(config.provider)
+        self.cache = self._get_cache()
+        # Fuzzy matching can return another prompt's answer, so it is opt-in
+        self.semantic_match = os.getenv("SEMANTIC_CACHE_FUZZY", "0") == "1"
+        self._prefix_models: Dict[str, genai.GenerativeModel] = {}
+        self._prefix_cache: Optional[caching.CachedContent] = None
+        self.embedding_model = os.getenv(f"{config.provider.name}_EMBEDDING_MODEL",
+                                         self.EMBEDDING_MODELS[config.provider])
+
+    @classmethod
+    def _get_cache(cls) -> Optional[SemanticCache]:
+        """Return the shared response cache unless disabled via SEMANTIC_CACHE=0"""
+        if os.getenv("SEMANTIC_CACHE", "1") == "0":
+            return None
+        if cls._cache is None:
+            cls._cache = SemanticCache(
+                path=os.getenv("SEMANTIC_CACHE_PATH", "semantic_cache.db"),
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+            )
+        return cls._cache
+
+    @classmethod
+    def _get_throttle(cls, provider: ModelProvider) -> Tuple[asyncio.Semaphore, RateLimiter]:
+        """Return the concurrency and QPM limits shared by all models of a provider"""
+        if provider not in cls._throttles:
+            default_concurrency = 20
+            if provider == ModelProvider.OLLAMA:
+                default_concurrency = os.getenv("OLLAMA_NUM_PARALLEL", default_concurrency)
+            concurrency = int(os.getenv(f"{provider.name}_CONCURRENCY", default_concurrency))
+            qpm = int(os.getenv(f"{provider.name}_QPM", cls.DEFAULT_QPM[provider]))
+            cls._throttles[provider] = (asyncio.Semaphore(concurrency), RateLimiter(qpm, 60))
+        return cls._throttles[provider]
 
     def _initialize_provider(self):
-        """Initialize provider-specific configurations"""
+        """Initialize provider-specific clients once per model"""
         if self.config.provider == ModelProvider.GEMINI:
-            genai.configure(api_key=self.config.api_key)
+            if self.config.api_key != AIModel._gemini_api_key:
+                genai.configure(api_key=self.config.api_key)
+                AIModel._gemini_api_key = self.config.api_key
+            self.gemini_model = self._get_gemini_model(self.config.model_name)
         elif self.config.provider == ModelProvider.OPENAI:
-            openai.api_key = self.config.api_key
+            self.async_openai_client = openai.AsyncOpenAI(api_key=self.config.api_key,
+                                                          base_url=self.config.base_url)
+        elif self.config.provider == ModelProvider.OLLAMA:
+            self.async_ollama_client = ollama.AsyncClient(host=self.config.base_url)
 
-    def generate(self, prompt: str, system_prompt: str) -> str:
-        """Generate response from AI model"""
+    async def cache_prefix(self, system_prompt: str):
+        """Register a system prompt reused across calls for provider-side prefix caching"""
+        if self.config.provider != ModelProvider.GEMINI:
+            # OpenAI caches repeated prompt prefixes automatically and Ollama keeps
+            # the KV cache of a loaded model, so a stable system prompt is enough
+            return
+        if (len(system_prompt) // 4 < self.PREFIX_CACHE_MIN_TOKENS
+                or self.config.model_name in self._prefix_unsupported):
+            return
+        await self.release_prefix()
         try:
-            start_time = time.time()
-            self.logger.log(f"Generating response with {self.config.model_name}", LogLevel.INFO)
-            
-            if self.config.provider == ModelProvider.OLLAMA:
-                response = ollama.chat(
-                    model=self.config.model_name,
-                    messages=[{"role": "system", "content": system_prompt},
-                              {"role": "user", "content": prompt}]
-                )
-                content = response['message']['content']
-            elif self.config.provider == ModelProvider.OPENAI:
-                response = openai.ChatCompletion.create(
-                    model=self.config.model_name,
-                    messages=[{"role": "system", "content": system_prompt},
-                              {"role": "user", "content": prompt}]
-                )
-                content = response.choices[0].message['content']
-            elif self.config.provider == ModelProvider.GEMINI:
-                model = genai.GenerativeModel(self.config.model_name)
-                response = model.generate_content(f"SYSTEM: {system_prompt}\nUSER: {prompt}")
-                content = response.text.replace("**", "")
-
-            self.logger.log(f"Generation completed in {time.time()-start_time:.2f}s", LogLevel.SUCCESS)
-            return content
+            cached_content = await asyncio.to_thread(
+                caching.CachedContent.create,
+                model=self.config.model_name,
+                system_instruction=system_prompt,
+                ttl=self.PREFIX_CACHE_TTL
+            )
+            self._prefix_cache = cached_content
+            self._prefix_models = {
+                system_prompt: genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+            }
+            self.logger.log(f"Cached prompt prefix as {cached_content.name}", LogLevel.DEBUG)
+        except Exception as e:
+            # Don't pay for the round trip again on a model without caching support
+            self._prefix_unsupported.add(self.config.model_name)
+            self.logger.log(f"Prompt prefix caching unavailable: {str(e)}", LogLevel.DEBUG)
+
+    async def release_prefix(self):
+        """Delete the provider-side prefix cache instead of waiting for its TTL"""
+        cached_content, self._prefix_cache = self._prefix_cache, None
+        self._prefix_models = {}
+        if cached_content is None:
+            return
+        try:
+            await asyncio.to_thread(cached_content.delete)
+        except Exception as e:
+            self.logger.log(f"Could not delete cached prefix: {str(e)}", LogLevel.DEBUG)
+
+    @classmethod
+    def _get_gemini_model(cls, model_name: str) -> genai.GenerativeModel:
+        """Return the shared GenerativeModel for a model name"""
+        if model_name not in cls._gemini_models:
+            cls._gemini_models[model_name] = genai.GenerativeModel(model_name)
+        return cls._gemini_models[model_name]
+
+    async def agenerate(self, prompt: str, system_prompt: str, json_mode: bool = False,
+                        semantic: bool = True) -> str:
+        """Generate response from AI model without blocking the event loop"""
+        return "".join([chunk async for chunk in self.astream(prompt, system_prompt, json_mode, semantic)])
+
+    async def astream(self, prompt: str, system_prompt: str, json_mode: bool = False,
+                      semantic: bool = True) -> AsyncIterator[str]:
+        """Stream response chunks from AI model as they arrive
+
+        Identical prompts are always served from the cache. With SEMANTIC_CACHE_FUZZY=1,
+        calls that allow it also match similar user prompts under the same system prompt.
+        """
+        start_time = time.time()
+        model_name = self.config.model_name
+        system_key = SemanticCache.make_key(system_prompt)
+        cache_key, embedding = SemanticCache.make_key(f"{system_prompt}\n{prompt}"), None
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get, model_name, cache_key)
+            if cached is None and semantic and self.semantic_match:
+                # Only the varying user prompt is embedded; the fixed template would dominate
+                embedding = await self._aembed(prompt)
+                if embedding:
+                    cached = await asyncio.to_thread(self.cache.search, model_name, system_key, embedding)
+            if cached is not None:
+                self.logger.log(f"Cache hit for {self.config.model_name}", LogLevel.SUCCESS)
+                yield cached
+                return
+
+        self.logger.log(f"Generating response with {self.config.model_name}", LogLevel.INFO)
+        chunks = []
+        try:
+            for attempt in range(self.MAX_RETRIES):
+                try:
+                    async with self._sem, self._limiter:
+                        async for chunk in self._astream_once(prompt, system_prompt, json_mode):
+                            chunks.append(chunk)
+                            yield chunk
+                    break
+                except Exception as e:
+                    # Only retry transient failures, and only if nothing has been handed to the caller yet
+                    if chunks or attempt == self.MAX_RETRIES - 1 or not self._is_retryable(e):
+                        raise
+                    delay = min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt) + random.uniform(0, 1)
+                    self.logger.log(f"Generation attempt {attempt + 1} failed: {str(e)}. "
+                                    f"Retrying in {delay:.1f}s", LogLevel.WARNING)
+                    await asyncio.sleep(delay)
         except Exception as e:
             self.logger.log(f"Generation failed: {str(e)}", LogLevel.ERROR)
             raise
 
+        if self.cache:
+            await asyncio.to_thread(self.cache.insert, model_name, system_key, cache_key,
+                                    embedding, "".join(chunks))
+        self.logger.log(f"Generation completed in {time.time()-start_time:.2f}s", LogLevel.SUCCESS)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """True for rate limits, server errors, timeouts and dropped connections"""
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError,
+                              httpx.TransportError, openai.APIConnectionError)):
+            return True
+        # openai/ollama expose status_code; google.api_core errors expose the HTTP code as code
+        status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+        return isinstance(status, int) and (status == 429 or status >= 500)
+
+    async def _astream_once(self, prompt: str, system_prompt: str,
+                            json_mode: bool = False) -> AsyncIterator[str]:
+        """Issue a single streaming request to the configured provider"""
+        if self.config.provider == ModelProvider.OLLAMA:
+            stream = await self.async_ollama_client.chat(
+                model=self.config.model_name,
+                messages=[{"role": "system", "content": system_prompt},
+                          {"role": "user", "content": prompt}],
+                stream=True,
+                **({"format": "json"} if json_mode else {})
+            )
+            async for part in stream:
+                yield part['message']['content']
+        elif self.config.provider == ModelProvider.OPENAI:
+            stream = await self.async_openai_client.chat.completions.create(
+                model=self.config.model_name,
+                messages=[{"role": "system", "content": system_prompt},
+                          {"role": "user", "content": prompt}],
+                stream=True,
+                **({"response_format": {"type": "json_object"}} if json_mode else {})
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        elif self.config.provider == ModelProvider.GEMINI:
+            prefix_model = self._prefix_models.get(system_prompt)
+            if prefix_model:
+                model, contents = prefix_model, prompt
+            else:
+                model, contents = self.gemini_model, f"SYSTEM: {system_prompt}\nUSER: {prompt}"
+            response = await model.generate_content_async(
+                contents,
+                stream=True,
+                **({"generation_config": {"response_mime_type": "application/json"}} if json_mode else {})
+            )
+            carry = ""
+            async for chunk in response:
+                if json_mode:
+                    yield chunk.text
+                    continue
+                # A trailing '*' may be half of a '**' split across chunks; hold it back
+                text = (carry + chunk.text).replace("**", "")
+                carry = "*" if text.endswith("*") else ""
+                if carry:
+                    text = text[:-1]
+                if text:
+                    yield text
+            if carry:
+                yield carry
+        else:
+            raise ValueError(f"Unsupported provider: {self.config.provider}")
+
+    async def forget(self, prompt: str, system_prompt: str):
+        """Drop the cached response for a prompt so the next call regenerates it"""
+        if self.cache:
+            cache_key = SemanticCache.make_key(f"{system_prompt}\n{prompt}")
+            await asyncio.to_thread(self.cache.delete, self.config.model_name, cache_key)
+
+    async def _aembed(self, text: str) -> Optional[List[float]]:
+        """Embed text for the semantic cache without blocking the event loop"""
+        try:
+            async with self._sem, self._limiter:
+                if self.config.provider == ModelProvider.OLLAMA:
+                    response = await self.async_ollama_client.embeddings(
+                        model=self.embedding_model, prompt=text)
+                    return response['embedding']
+                elif self.config.provider == ModelProvider.OPENAI:
+                    response = await self.async_openai_client.embeddings.create(model=self.embedding_model, input=text)
+                    return response.data[0].embedding
+                elif self.config.provider == ModelProvider.GEMINI:
+                    response = await genai.embed_content_async(model=self.embedding_model, content=text)
+                    return response['embedding']
+        except Exception as e:
+            self.logger.log(f"Embedding failed, bypassing semantic cache: {str(e)}", LogLevel.WARNING)
+        return None
+
+# Response Parsing
+# The path stays on its header line; blank lines may separate it from the fence
+CODE_BLOCK_RE = re.compile(r'^[ \t]*FILE:[ \t]*([^\n]+?)[ \t]*\n(?:[ \t]*\n)*[ \t]*```[^\n]*\n(.*?)^[ \t]*```',
+                           re.M | re.S)
+FILE_HEADER_RE = re.compile(r'[ \t]*FILE:[ \t]*(.*?)\s*$')
+FENCE_RE = re.compile(r'[ \t]*```')
+PROJECT_NAME_RE = re.compile(r'^[ \t]*PROJECT_NAME:[ \t]*(.*?)[ \t]*$', re.M)
+TASKS_RE = re.compile(r'^[ \t]*TASKS:[ \t]*(.*?)[ \t]*$', re.M)
+
+class CodeBlockParser:
+    """Incremental parser for FILE: headers followed by fenced code blocks"""
+    def __init__(self):
+        self.files: Dict[str, str] = {}
+        self.text_lines: List[str] = []
+        self._pending = ""
+        self._current_file = None
+        self._in_block = False
+        self._body = io.StringIO()
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of streamed text and return the files it completed"""
+        self._pending += chunk
+        *lines, self._pending = self._pending.split('\n')
+        completed = []
+        for line in lines:
+            self._feed_line(line, completed)
+        return completed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush buffered text and return any file left open"""
+        completed = []
+        if self._pending:
+            self._feed_line(self._pending, completed)
+            self._pending = ""
+        self._finish_file(completed)
+        return completed
+
+    def _feed_line(self, line: str, completed: List[Tuple[str, str]]):
+        """Advance the state machine by one line"""
+        header = FILE_HEADER_RE.match(line)
+        if header:
+            self._finish_file(completed)
+            self._current_file = header.group(1)
+        elif FENCE_RE.match(line):
+            if self._in_block:
+                self._finish_file(completed)
+            elif self._current_file:
+                self._in_block = True
+        elif self._current_file:
+            self._body.write(line)
+            self._body.write('\n')
+        else:
+            self.text_lines.append(line)
+
+    def _finish_file(self, completed: List[Tuple[str, str]]):
+        """Emit the current file if it has content and reset the state"""
+        if self._current_file:
+            content = self._body.getvalue().strip()
+            if content:
+                self.files[self._current_file] = content
+                completed.append((self._current_file, content))
+        self._current_file, self._in_block, self._body = None, False, io.StringIO()
+
 # Agent Classes
 class BaseAgent:
     """Base class for all agents"""
+    ui = get_console_ui()
+
     def __init__(self, role: str, model_config: ModelConfig):
         self.role = role
         self.model = AIModel(model_config)
-        self.logger = Logger(role)
-        self.db = DatabaseManager()
-        self.ui = ConsoleUI()
+        self.logger = get_logger(role)
+
+    @functools.cached_property
+    def db(self) -> DatabaseManager:
+        """Database manager, opened on first access"""
+        return get_db_manager()
 
-    def _run_command(self, command: str) -> str:
-        """Execute shell commands with logging"""
-        self.logger.log(f"Executing command: {command}", LogLevel.DEBUG)
+    def _run_command(self, command: List[str]) -> Optional[str]:
+        """Execute a command directly (no shell) with logging"""
+        self.logger.log(f"Executing command: {subprocess.list2cmdline(command)}", LogLevel.DEBUG)
         try:
-            result = subprocess.run(command, shell=True, check=True, 
-                                  capture_output=True, text=True)
+            result = subprocess.run(resolve_command(command), shell=False, check=True,
+                                    capture_output=True, text=True)
+            return result.stdout
+        except subprocess.CalledProcessError as e:
+            self.logger.log(f"Command failed: {e.stderr}", LogLevel.ERROR)
+            return None
+        except OSError as e:
+            self.logger.log(f"Command could not be started: {str(e)}", LogLevel.ERROR)
+            return None
+
+    def _stream_command(self, command: List[str]) -> bool:
+        """Execute a long-running command, logging its output line by line"""
+        self.logger.log(f"Executing command: {subprocess.list2cmdline(command)}", LogLevel.DEBUG)
+        try:
+            with subprocess.Popen(resolve_command(command), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  text=True) as process:
+                for line in process.stdout:
+                    self.logger.log(line.rstrip(), LogLevel.DEBUG)
+        except OSError as e:
+            self.logger.log(f"Command could not be started: {str(e)}", LogLevel.ERROR)
+            return False
+        if process.returncode:
+            self.logger.log(f"Command exited with status {process.returncode}", LogLevel.ERROR)
+            return False
+        return True
+
+    def _run_shell_command(self, command: str) -> Optional[str]:
+        """Execute a shell pipeline; only for trusted commands that need shell syntax"""
+        self.logger.log(f"Executing shell command: {command}", LogLevel.DEBUG)
+        try:
+            result = subprocess.run(command, shell=True, check=True,
+                                    capture_output=True, text=True)
             return result.stdout
         except subprocess.CalledProcessError as e:
             self.logger.log(f"Command failed: {e.stderr}", LogLevel.ERROR)
@@ -230,36 +773,48 @@ class BaseAgent:
 
 class ProjectManager(BaseAgent):
     """Agent for project planning and management"""
-    def create_project_plan(self, user_request: str) -> Dict[str, Any]:
+    PROJECT_NAME_PLACEHOLDER = "<project_name>"
+
+    async def create_project_plan(self, user_request: str) -> Dict[str, Any]:
         """Generate project structure and tasks with AI-generated name"""
-        # Generate project name
-        project_name = self._generate_project_name(user_request)
-        
-        # Generate project structure
+        # The structure uses a placeholder name so both requests can run at once
+        placeholder = self.PROJECT_NAME_PLACEHOLDER
         structure_prompt = f"""Create project structure for: {user_request}
-        Project name: {project_name}
+        Project name: {placeholder}
         Include:
         - Backend structure
         - Frontend components
         - Database setup
         - Deployment config
         Format your response with:
-        PROJECT_NAME: {project_name}
+        PROJECT_NAME: {placeholder}
         TASKS: comma,separated,tasks
         FILE: path/to/file
         ```code
         content
         ```"""
         
-        response = self.model.generate(
-            prompt=structure_prompt,
-            system_prompt="You are a senior project manager. Create comprehensive project plans."
+        project_name, parser = await asyncio.gather(
+            self._generate_project_name(user_request),
+            self._stream_structure(structure_prompt)
         )
         
-        return self._parse_response(response, project_name)
+        return self._parse_response(parser, project_name, user_request)
+
+    async def _stream_structure(self, structure_prompt: str) -> CodeBlockParser:
+        """Stream the project structure, parsing files as they complete"""
+        parser = CodeBlockParser()
+        async for chunk in self.model.astream(
+            prompt=structure_prompt,
+            system_prompt="You are a senior project manager. Create comprehensive project plans."
+        ):
+            for path, _ in parser.feed(chunk):
+                self.logger.log(f"Planned file: {path}", LogLevel.DEBUG)
+        parser.close()
+        return parser
 
-    def _generate_project_name(self, user_request: str) -> str:
-        """Generate creative technical project name using AI"""
+    async def _generate_project_name(self, user_request: str) -> Optional[str]:
+        """Generate creative technical project name using AI, or None if that fails"""
         name_prompt = f"""Generate a technical project name based on: {user_request}
         Rules:
         1. Use 2-4 words
@@ -269,15 +824,12 @@ class ProjectManager(BaseAgent):
         5. Avoid special characters"""
         
         try:
-            raw_name = self.model.generate(
+            raw_name = (await self.model.agenerate(
                 prompt=name_prompt,
                 system_prompt="You are a technical branding expert. Generate project names."
-            ).strip()
+            )).strip()
             
-            # Sanitize the name
-            sanitized = raw_name.split('\n')[0].split(':')[-1].strip()
-            sanitized = sanitized.replace(' ', '_').replace('-', '_')[:30]
-            sanitized = sanitized.strip('_')  # إزالة الشرطات الطرفية
+            sanitized = self._sanitize_name(raw_name)
             
             # Ensure the name is not empty
             if not sanitized:
@@ -287,7 +839,14 @@ class ProjectManager(BaseAgent):
                 
         except Exception as e:
             self.logger.log(f"Name generation failed, using fallback name: {str(e)}", LogLevel.WARNING)
-            return self._generate_fallback_name(user_request)
+            return None
+
+    @staticmethod
+    def _sanitize_name(raw_name: str) -> str:
+        """Reduce a model-supplied name to a safe directory name"""
+        sanitized = raw_name.split('\n')[0].split(':')[-1].strip()
+        sanitized = re.sub(r'\W+', '_', sanitized)[:30]
+        return sanitized.strip('_')  # إزالة الشرطات الطرفية
 
     def _generate_fallback_name(self, user_request: str) -> str:
         """Generate fallback project name"""
@@ -297,116 +856,231 @@ class ProjectManager(BaseAgent):
         timestamp = str(int(time.time()))[-6:]
         return f"Project_{clean_request}_{timestamp}"
 
-    def _parse_response(self, response: str, project_name: str) -> Dict[str, Any]:
-        """Parse AI response into structured data with project name"""
-        tasks = []
-        files = {}
-        current_file = None
+    def _parse_response(self, parser: CodeBlockParser, project_name: Optional[str],
+                        user_request: str) -> Dict[str, Any]:
+        """Build structured plan data from a parsed AI response"""
+        text = '\n'.join(parser.text_lines)
         
-        for line in response.split('\n'):
-            line = line.strip()
-            if line.startswith('PROJECT_NAME:'):
-                # تحديث اسم المشروع من الاستجابة إذا وجد
-                new_name = line.split('PROJECT_NAME:')[1].strip()[:30]
-                if new_name:
-                    project_name = new_name
-            elif line.startswith('TASKS:'):
-                tasks = [t.strip() for t in line.split('TASKS:')[1].split(',')]
-            elif line.startswith('FILE:'):
-                current_file = line.split('FILE:')[1].strip()
-            elif line.startswith('```'):
-                current_file = None
-            elif current_file:
-                files[current_file] = files.get(current_file, []) + [line]
+        # The generated name wins; PROJECT_NAME only stands in when generation failed
+        if not project_name:
+            name_match = PROJECT_NAME_RE.search(text)
+            if name_match and name_match.group(1).strip() != self.PROJECT_NAME_PLACEHOLDER:
+                project_name = self._sanitize_name(name_match.group(1))
         if not project_name:
-            project_name = f"project_{int(time.time())}"
+            project_name = self._generate_fallback_name(user_request)
+        tasks_match = TASKS_RE.search(text)
+        tasks = [t.strip() for t in tasks_match.group(1).split(',')] if tasks_match else []
         
         return {
         "project_name": project_name,
         "tasks": tasks,
-        "project_structure": {k: '\n'.join(v) for k, v in files.items()}
+        "project_structure": {path: content.replace(self.PROJECT_NAME_PLACEHOLDER, project_name)
+                              for path, content in parser.files.items()}
         }
 
 # Fixed DeveloperAgent with code extraction
 class DeveloperAgent(BaseAgent):
     """Agent for code generation with automatic reviews"""
-    def generate_code(self, task: str, context: Dict[str, Any]) -> Dict[str, str]:
-        """Generate and review code artifacts"""
-        prompt = f"""Write production code for: {task}
-        Context: {json.dumps(context, indent=2)}
+    BATCH_SIZE = int(os.getenv("DEVELOPER_BATCH_SIZE", 4))
+
+    async def generate_code(self, task: str, context: Dict[str, Any]) -> Dict[str, str]:
+        """Generate and review code artifacts for a single task"""
+        return await self.generate_code_batch([task], context)
+
+    async def generate_code_batch(self, tasks: List[str], context: Dict[str, Any]) -> Dict[str, str]:
+        """Generate and review code artifacts for several tasks in one request"""
+        return await self.review_code(await self.write_code_batch(tasks, context), tasks, context)
+
+    async def prepare_context(self, context: Dict[str, Any]):
+        """Cache the project prefix shared by every batch of a pipeline"""
+        await self.model.cache_prefix(self._system_prompt(context))
+
+    async def release_context(self):
+        """Drop the cached project prefix once the pipeline is done with it"""
+        await self.model.release_prefix()
+
+    def _system_prompt(self, context: Dict[str, Any]) -> str:
+        """Build the stable prompt prefix: instructions first, then project context"""
+        return f"""You are a senior developer. Write clean, maintainable code.
         Include: Proper error handling, comments, and tests.
-        Format: FILE: path/to/file\n```code\ncontent\n```"""
-        
-        response = self.model.generate(
+        Respond with a single JSON object of the form:
+        {{"task_ids": [1, 2], "files": {{"path/to/file": "file content"}}}}
+        Context: {json.dumps(context, indent=2)}"""
+
+    @staticmethod
+    def _batch_prompt(tasks: List[str]) -> str:
+        """Build the per-batch prompt that follows the shared prefix"""
+        task_list = '\n'.join(f"{i}. {task}" for i, task in enumerate(tasks, 1))
+        return f"""Write production code for the following tasks:
+        {task_list}"""
+
+    async def write_code_batch(self, tasks: List[str], context: Dict[str, Any]) -> Dict[str, str]:
+        """Generate code artifacts for several tasks in one request, without review"""
+        prompt, system_prompt = self._batch_prompt(tasks), self._system_prompt(context)
+        response = await self.model.agenerate(
             prompt=prompt,
-            system_prompt="You are a senior developer. Write clean, maintainable code."
+            system_prompt=system_prompt,
+            json_mode=True,
+            semantic=False
         )
-        new_code = self._extract_code(response)
-        existing_code = {f: self._get_existing_code(f) for f in new_code.keys()}
-        
+        files = self._extract_code(response)
+        if not files and len(tasks) > 1:
+            # Usually the reply hit the output token limit mid-JSON; retry as two smaller batches
+            self.logger.log(f"No files parsed for {len(tasks)} tasks, splitting the batch", LogLevel.WARNING)
+            await self.model.forget(prompt, system_prompt)
+            middle = len(tasks) // 2
+            halves = await asyncio.gather(self.write_code_batch(tasks[:middle], context),
+                                          self.write_code_batch(tasks[middle:], context))
+            files = {**halves[0], **halves[1]}
+        return files
+
+    async def review_code(self, new_code: Dict[str, str], tasks: Optional[List[str]] = None,
+                          context: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """Interactively review artifacts, returning them only if approved
+
+        When the batch that produced them is given, a rejection also evicts its
+        cached responses so re-running the request generates fresh code.
+        """
+        if not new_code:
+            # Nothing usable came back; don't keep serving that reply from the cache
+            if tasks:
+                await self._forget_batch(tasks, context)
+            return {}
+        existing_code = await self._get_existing_codes(list(new_code))
+
+        # The prompt stays on the main thread so Ctrl-C can interrupt it; a worker
+        # thread blocked in input() would hold up interpreter shutdown
         if CodeReviewer().review_changes(new_code, existing_code):
             return new_code
+        if tasks:
+            await self._forget_batch(tasks, context)
         return {}
 
+    async def _forget_batch(self, tasks: List[str], context: Dict[str, Any]):
+        """Evict cached responses for a batch and every half it may have been split into"""
+        await self.model.forget(self._batch_prompt(tasks), self._system_prompt(context))
+        if len(tasks) > 1:
+            middle = len(tasks) // 2
+            await self._forget_batch(tasks[:middle], context)
+            await self._forget_batch(tasks[middle:], context)
+
     def _extract_code(self, response: str) -> Dict[str, str]:
-        """Extract code blocks from model response"""
-        files = {}
-        current_file = None
-        
-        for line in response.split('\n'):
-            if line.startswith('FILE:'):
-                current_file = line.split('FILE:')[1].strip()
-                files[current_file] = []
-            elif line.startswith('```'):
-                continue
-            elif current_file:
-                files[current_file].append(line)
-        
-        return {k: '\n'.join(v).strip() for k, v in files.items() if v}
+        """Extract code files from the model's JSON response"""
+        payload = response.strip()
+        if payload.startswith('```'):
+            payload = payload.split('\n', 1)[-1].rsplit('```', 1)[0]
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            data = None
+        files = data.get('files') if isinstance(data, dict) else None
+        if isinstance(files, list):
+            # Also accept [{"path": ..., "content": ...}, ...]
+            files = {item.get('path'): item.get('content') for item in files if isinstance(item, dict)}
+        if not isinstance(files, dict):
+            self.logger.log("Response has no usable files object, falling back to FILE: blocks",
+                            LogLevel.WARNING)
+            return self._extract_file_blocks(response)
+
+        return {path: content.strip() for path, content in files.items()
+                if isinstance(path, str) and path and isinstance(content, str) and content.strip()}
+
+    def _extract_file_blocks(self, response: str) -> Dict[str, str]:
+        """Extract FILE: delimited code blocks from model response"""
+        return {path: content for path, body in CODE_BLOCK_RE.findall(response)
+                if (content := body.strip())}
+
+    async def _get_existing_codes(self, filenames: List[str]) -> Dict[str, str]:
+        """Read existing versions of several files concurrently"""
+        contents = await asyncio.gather(
+            *[asyncio.to_thread(self._get_existing_code, f) for f in filenames]
+        )
+        return dict(zip(filenames, contents))
 
     def _get_existing_code(self, filename: str) -> str:
         """Check for existing code versions"""
-        if os.path.exists(filename):
+        try:
+            info = os.stat(filename)
+        except OSError:
+            return ""
+        if not stat.S_ISREG(info.st_mode) or not info.st_size:
+            return ""
+        if os.name != 'posix':
             with open(filename, 'r') as f:
                 return f.read()
-        return ""
+
+        # MAP_POPULATE prefaults the whole file in one call where Linux supports it
+        fd = os.open(filename, os.O_RDONLY)
+        try:
+            with mmap.mmap(fd, 0, flags=mmap.MAP_SHARED | getattr(mmap, 'MAP_POPULATE', 0),
+                           prot=mmap.PROT_READ) as mapped:
+                return mapped[:].decode('utf-8', errors='replace')
+        finally:
+            os.close(fd)
 
 # Enhanced DevOpsAgent with project folder support
 class DevOpsAgent(BaseAgent):
-    def deploy_project(self, project_data: Dict[str, Any]):
+    async def deploy_project(self, project_data: Dict[str, Any]):
         """Secure deployment pipeline"""
         try:
-            project_dir = project_data.get('project_name', 'new_project').strip()
-            
-            # التحقق من صحة اسم المجلد
-            if not project_dir:
-                project_dir = "new_project"
-                self.logger.log("Using default project name 'new_project'", LogLevel.WARNING)
-                
-            # إنشاء المسار بشكل آمن
-            full_path = os.path.abspath(os.path.normpath(project_dir))
-            os.makedirs(full_path, exist_ok=True)
-            
-            self._write_project_files(full_path, project_data.get('code', {}))
+            full_path = self.prepare_project_dir(project_data.get('project_name', 'new_project'))
+            await self._write_project_files(full_path, project_data.get('code', {}))
             self.logger.log(f"Project deployed to {full_path}", LogLevel.SUCCESS)
             
         except Exception as e:
             self.logger.log(f"Deployment failed: {str(e)}", LogLevel.ERROR)
             raise
 
-    def _write_project_files(self, project_dir: str, code_artifacts: Dict[str, str]):
-        """Write files to project directory"""
-        for file_path, content in code_artifacts.items():
-            full_path = os.path.join(project_dir, file_path)
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, 'w') as f:
-                f.write(content)
-            self.logger.log(f"Created file: {file_path}", LogLevel.INFO)
+    async def deploy_from_queue(self, project_dir: str, queue: asyncio.Queue):
+        """Write approved artifacts as they arrive until a None sentinel is received"""
+        try:
+            while (code_artifacts := await queue.get()) is not None:
+                await self._write_project_files(project_dir, code_artifacts)
+            self.logger.log(f"Project deployed to {project_dir}", LogLevel.SUCCESS)
+        except Exception as e:
+            self.logger.log(f"Deployment failed: {str(e)}", LogLevel.ERROR)
+            raise
+
+    def prepare_project_dir(self, project_name: str) -> str:
+        """Create the project directory and return its absolute path"""
+        project_dir = project_name.strip()
+        
+        # التحقق من صحة اسم المجلد
+        if not project_dir:
+            project_dir = "new_project"
+            self.logger.log("Using default project name 'new_project'", LogLevel.WARNING)
+            
+        # إنشاء المسار بشكل آمن
+        full_path = os.path.abspath(os.path.normpath(project_dir))
+        os.makedirs(full_path, exist_ok=True)
+        return full_path
+
+    async def _write_project_files(self, project_dir: str, code_artifacts: Dict[str, str]):
+        """Write files to project directory concurrently"""
+        full_paths = {file_path: os.path.join(project_dir, file_path) for file_path in code_artifacts}
+        for directory in {os.path.dirname(path) for path in full_paths.values()}:
+            os.makedirs(directory, exist_ok=True)
+
+        await asyncio.gather(*[
+            self._write_project_file(file_path, full_paths[file_path], content)
+            for file_path, content in code_artifacts.items()
+        ])
+
+    async def _write_project_file(self, file_path: str, full_path: str, content: str):
+        """Write a single file off the event loop"""
+        await asyncio.to_thread(self._write_text, full_path, content)
+        self.logger.log(f"Created file: {file_path}", LogLevel.INFO)
+
+    @staticmethod
+    def _write_text(path: str, content: str):
+        """Write text content to a file"""
+        with open(path, 'w') as f:
+            f.write(content)
 
 class SecurityManager:
     """Handles security configurations and checks"""
     def __init__(self):
-        self.logger = Logger("SecurityManager")
+        self.logger = get_logger("SecurityManager")
 
     def add_security_deps(self, project_type: str):
         """Add security dependencies based on project type"""
@@ -430,41 +1104,31 @@ API_KEY=your_secure_key"""
 
 class CodeReviewer:
     """Handles automatic code reviews and change approval"""
+    # Approval only needs the changed lines, so keep surrounding context short
+    DIFF_CONTEXT = 1
+
     def __init__(self):
-        self.ui = ConsoleUI()
+        self.ui = get_console_ui()
 
     def review_changes(self, code_artifacts: Dict[str, str], existing_code: Dict[str, str]) -> bool:
         """Conduct interactive code review for all files"""
-        all_diffs = []
-        for filename, new_code in code_artifacts.items():
-            old_code = existing_code.get(filename, "")
-            diff = difflib.unified_diff(
-                old_code.splitlines(),
-                new_code.splitlines(),
-                fromfile=f'a/{filename}',
-                tofile=f'b/{filename}',
-                lineterm=''
-            )
-            all_diffs.extend(diff)
-        
-        print(f"\n{Fore.CYAN}=== All Code Changes ==={Style.RESET_ALL}")
-        for line in all_diffs:
-            if line.startswith('+'):
-                print(Fore.GREEN + line + Style.RESET_ALL)
-            elif line.startswith('-'):
-                print(Fore.RED + line + Style.RESET_ALL)
-            else:
-                print(line)
-        
-        return self.ui.confirm_action("Approve all changes?")
+        # Agents keep logging while the user reads; hold those lines until the answer is in
+        with Logger.hold_console():
+            print(f"\n{CYAN}=== All Code Changes ===")
+            for filename, new_code in code_artifacts.items():
+                old_code = existing_code.get(filename, "")
+                write_diff(diff_lines(filename, old_code, new_code, self.DIFF_CONTEXT))
+
+            return self.ui.confirm_action("Approve all changes?")
 
 # Orchestration System
 class Orchestrator:
     """Main orchestration controller"""
     def __init__(self, agents_config: Dict[str, ModelConfig]):
+        # Agents build their provider clients up front so the first pipeline run starts warm
         self.agents = self._initialize_agents(agents_config)
-        self.ui = ConsoleUI()
-        self.logger = Logger("Orchestrator")
+        self.ui = get_console_ui()
+        self.logger = get_logger("Orchestrator")
 
     def _initialize_agents(self, configs: Dict[str, ModelConfig]) -> Dict[str, BaseAgent]:
         """Initialize all agents"""
@@ -474,7 +1138,7 @@ class Orchestrator:
             'devops': DevOpsAgent("DevOps", configs['devops'])
         }
 
-    def execute_pipeline(self, user_request: str):
+    async def execute_pipeline(self, user_request: str):
         """Execute full project creation pipeline"""
         try:
             # Select project features
@@ -486,28 +1150,54 @@ class Orchestrator:
             ]
             selected = self.ui.show_menu("Project Features", enhancements)
             
-            # Create project plan
-            project_plan = self.agents['project_manager'].create_project_plan(user_request)
+            self.logger.log(f"Selected features: {', '.join(enhancements[i] for i in selected)}",
+                            LogLevel.INFO)
             
-            # Generate code
-            code_artifacts = {}
-            for task in project_plan['tasks']:
-                code_artifacts.update(self.agents['developer'].generate_code(task, project_plan))
-
-
+            # Create project plan
+            project_plan = await self.agents['project_manager'].create_project_plan(user_request)
             if not project_plan.get('project_name'):
                 raise ValueError("Project name is missing in project plan")
             
+            developer, devops = self.agents['developer'], self.agents['devops']
+            tasks = project_plan['tasks']
+            batch_size = max(1, developer.BATCH_SIZE)
+            batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+            
+            # Generate every batch up front, review them in completion order and hand
+            # approved code to DevOps so generation and writes overlap the user's review.
+            # The prefix cache has to exist before the batches start to be read at all,
+            # so it is only worth the round trip when several batches share it
+            if len(batches) > 1:
+                await developer.prepare_context(project_plan)
+            deploy_queue: asyncio.Queue = asyncio.Queue()
+            project_dir = devops.prepare_project_dir(project_plan['project_name'])
+            deployer = asyncio.create_task(devops.deploy_from_queue(project_dir, deploy_queue))
+            async def write_batch(batch: List[str]) -> Tuple[List[str], Dict[str, str]]:
+                return batch, await developer.write_code_batch(batch, project_plan)
 
-            # Deploy project
-            self.agents['devops'].deploy_project({
-                'code': code_artifacts,
-                'project_name': project_plan['project_name'],
-                'enhancements': [enhancements[i] for i in selected]
-            })
+            generations = [asyncio.create_task(write_batch(batch)) for batch in batches]
+            try:
+                for generation in asyncio.as_completed(generations):
+                    batch, code = await generation
+                    approved = await developer.review_code(code, batch, project_plan)
+                    if deployer.done():
+                        # Surface a failed write now instead of after every review
+                        deployer.result()
+                    if approved:
+                        deploy_queue.put_nowait(approved)
+                deploy_queue.put_nowait(None)
+                await deployer
+            finally:
+                for task in [*generations, deployer]:
+                    task.cancel()
+                # Reap them so nothing is left pending on the reused loop
+                await asyncio.gather(*generations, deployer, return_exceptions=True)
         except Exception as e:
             self.logger.log(f"Pipeline failed: {str(e)}", LogLevel.ERROR)
             raise
+        finally:
+            await self.agents['developer'].release_context()
+            Logger.flush()
 
 # Main Execution
 if __name__ == "__main__":
@@ -531,7 +1221,10 @@ if __name__ == "__main__":
 
     # Initialize system
     orchestrator = Orchestrator(AGENT_CONFIGS)
-    ui = ConsoleUI()
+    ui = get_console_ui()
+    # A single loop keeps the shared provider semaphores bound to one event loop
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
 
     # Main loop
     while True:
@@ -543,12 +1236,20 @@ if __name__ == "__main__":
         ])
         
         if action == [0]:
-            user_request = input(f"{Fore.GREEN}Enter project description: {Style.RESET_ALL}")
-            orchestrator.execute_pipeline(user_request)
+            user_request = input(f"{GREEN}Enter project description: {RST}")
+            loop.run_until_complete(orchestrator.execute_pipeline(user_request))
         elif action == [1]:
-            subprocess.run("npm run dev", shell=True)
+            npm = shutil.which("npm")
+            if npm is None:
+                get_logger("System").log("npm was not found on PATH", LogLevel.ERROR)
+                continue
+            try:
+                subprocess.run([npm, "run", "dev"])
+            except OSError as e:
+                get_logger("System").log(f"Could not start dev server: {str(e)}", LogLevel.ERROR)
         elif action == [2]:
-            DatabaseManager().apply_migrations()
+            get_db_manager().apply_migrations()
         elif action == [3]:
-            print(f"{Fore.CYAN}Exiting system...{Style.RESET_ALL}")
+            print(f"{CYAN}Exiting system...")
+            loop.close()
             break
\ No newline at end of file